@@ -7,21 +7,38 @@ TeleScan2Coe Converter
 Converts TeleScan PE PCIE config space files (.tlscan) to Vivado COE files (.coe).
 """
 
+import os
 import sys
 import re
-import datetime
-import xml.etree.ElementTree as ET
+import glob
+import time
 from pathlib import Path
-from typing import Protocol
+from typing import Iterable, List, Optional, Protocol, Tuple
+
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
 
 __all__ = (
     "FileHandler",
     "XMLFileReader",
+    "FastXMLFileReader",
     "COEFileWriter",
     "TeleScanConverter",
+    "convert_many",
     "main"
 )
 
+_BYTES_RE = re.compile(rb'<bytes(?:\s[^>]*)?>([0-9a-fA-F\s]+)</bytes>')
+_SECTION_HEADERS = tuple(f"\n; {y * 256:04X}\n".encode('ascii') for y in range(16))
+_LINE_LENGTH = 37
+_ROWS_TEMPLATE = (b"........,........,........,........,\n" * 256)[:-2] + b';\n'
+# A conversion takes ~100 us; smaller batches lose more to pool startup and IPC than they gain
+_PARALLEL_MIN_FILES = 1000
+# (destination, source) offsets of each character column within a 37-byte line / 32-char chunk
+_COLUMNS = tuple((word * 9 + j, word * 8 + j) for word in range(4) for j in range(8))
+
 class FileHandler(Protocol):
     """Protocol defining file handling operations."""
 
@@ -29,7 +46,7 @@ class FileHandler(Protocol):
         """Read and parse content from a file."""
         ...
 
-    def write(self, path: Path, content: str) -> None:
+    def write(self, path: Path, content: bytes) -> None:
         """Write processed content to a file."""
         ...
 
@@ -38,14 +55,29 @@ class XMLFileReader:
 
     def read(self, path: Path) -> str:
         """Read and validate TeleScan XML file."""
-        tree = ET.parse(path)
-        bytes_element = tree.find('.//bytes')
+        text = None
+        # Own the file handle: breaking out of iterparse early would otherwise
+        # leave it open until the iterator is garbage collected
+        with open(path, 'rb') as f:
+            for _, elem in ET.iterparse(f, events=('end',)):
+                if elem.tag == 'bytes':
+                    text = elem.text
+                    break
+                elem.clear()
 
-        if bytes_element is None or bytes_element.text is None:
+        if text is None:
             raise ValueError("Invalid XML format: Missing <bytes> element")
 
-        hex_data = bytes_element.text.strip()
-        self._validate_hex(hex_data)
+        return self._normalize_hex(text)
+
+    @classmethod
+    def _normalize_hex(cls, text: str) -> str:
+        """Strip whitespace from the <bytes> payload and validate it."""
+        hex_data = text.strip()
+        if len(hex_data) != 8192:
+            # Payload wrapped over several lines; drop the embedded whitespace
+            hex_data = ''.join(hex_data.split())
+        cls._validate_hex(hex_data)
         return hex_data
 
     @staticmethod
@@ -53,15 +85,42 @@ class XMLFileReader:
         """Validate hexadecimal format and length."""
         if len(data) != 8192:
             raise ValueError(f"Invalid hex length: Expected 8192 characters, got {len(data)}")
-        if not re.fullmatch(r'[0-9a-fA-F]+', data):
+        try:
+            parsed = bytes.fromhex(data)
+        except ValueError:
+            parsed = None
+        # bytes.fromhex() skips whitespace, which would shrink the result
+        if parsed is None or len(parsed) != 4096:
             raise ValueError("Hex data contains invalid characters")
 
+class FastXMLFileReader(XMLFileReader):
+    """Extracts the <bytes> payload with a regex scan, skipping XML parsing."""
+
+    def read(self, path: Path) -> str:
+        """Read and validate TeleScan XML file."""
+        match = _BYTES_RE.search(path.read_bytes())
+        if match is not None:
+            try:
+                return self._normalize_hex(match.group(1).decode('ascii'))
+            except ValueError:
+                pass
+        # Unusual markup (CDATA, entities, comments, ...); let the XML parser handle it
+        return super().read(path)
+
 class COEFileWriter:
     """Handles COE file generation with proper formatting."""
 
-    def write(self, path: Path, content: str) -> None:
+    def write(self, path: Path, content: bytes) -> None:
         """Write formatted COE content to file."""
-        path.write_text(content)
+        # O_BINARY keeps Windows from translating newlines; it is 0 elsewhere
+        flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+        fd = os.open(path, flags, 0o666)
+        try:
+            view = memoryview(content)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
 
 class TeleScanConverter:
     """Main conversion processor with optimized memory handling."""
@@ -77,63 +136,121 @@ class TeleScanConverter:
         coe_content = self._generate_coe_content(hex_data, src_path)
         self.writer.write(dst_path, coe_content)
 
-    def _generate_coe_content(self, hex_data: str, src_path: Path) -> str:
+    def _generate_coe_content(self, hex_data: str, src_path: Path) -> bytes:
         """Generate COE formatted content from hex data."""
         header = self._create_header(src_path)
         body = self._create_body(hex_data)
         return header + body
 
     @staticmethod
-    def _create_header(src_path: Path) -> str:
+    def _create_header(src_path: Path) -> bytes:
         """Generate COE file header with metadata."""
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         return (
             f"; TeleScan to COE Conversion\n"
             f"; Source: {src_path.name}\n"
             f"; Generated: {timestamp}\n\n"
             "memory_initialization_radix=16;\n"
             "memory_initialization_vector=\n"
-        )
+        ).encode('utf-8')
 
     @staticmethod
-    def _create_body(hex_data: str) -> str:
+    def _create_body(hex_data: str) -> bytes:
         """Generate COE data body with optimized processing."""
-        return ''.join(TeleScanConverter._chunk_generator(hex_data))
+        data = hex_data.encode('ascii')
+        rows = bytearray(_ROWS_TEMPLATE)
 
-    @staticmethod
-    def _chunk_generator(hex_data: str) -> str:
-        """Efficiently generate formatted COE chunks."""
+        for dst, src in _COLUMNS:
+            rows[dst::_LINE_LENGTH] = data[src::32]
+
+        section = 16 * _LINE_LENGTH
         buffer = []
-        total_chunks = len(hex_data) // 32
 
-        for idx in range(total_chunks):
-            if idx % 16 == 0:
-                buffer.append(f"\n; {(idx // 16) * 256:04X}\n")
+        for y, header in enumerate(_SECTION_HEADERS):
+            buffer.append(header)
+            buffer.append(rows[y*section:(y+1)*section])
 
-            start = idx * 32
-            chunk = hex_data[start:start+32]
-            formatted = TeleScanConverter._format_chunk(chunk, is_last=idx == total_chunks-1)
-            buffer.append(formatted)
+        return b''.join(buffer)
 
-        return buffer
+def _convert_file(paths: Tuple[Path, Path]) -> Optional[str]:
+    """Convert a single file, returning the error message if it fails."""
+    src_path, dst_path = paths
+    try:
+        TeleScanConverter(FastXMLFileReader(), COEFileWriter()).convert(src_path, dst_path)
+    except (OSError, ValueError, ET.ParseError) as e:
+        return str(e)
+    return None
 
-    @staticmethod
-    def _format_chunk(chunk: str, is_last: bool) -> str:
-        """Format 32-character hex chunk into COE line."""
-        parts = [chunk[i*8:(i+1)*8] for i in range(4)]
-        terminator = ';' if is_last else ','
-        return f"{','.join(parts)}{terminator}\n"
+def convert_many(pairs: Iterable[Tuple[Path, Path]]) -> List[Tuple[Path, str]]:
+    """Convert (source, destination) pairs, using worker processes for large batches.
+
+    Returns a (source, error message) pair for every conversion that failed.
+    """
+    pairs = list(pairs)
+    workers = os.cpu_count() or 1
+    if workers == 1 or len(pairs) < _PARALLEL_MIN_FILES:
+        errors = [_convert_file(pair) for pair in pairs]
+    else:
+        # Deferred: pulls in multiprocessing, which most runs never need
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(pairs) // (workers * 4))
+        with ProcessPoolExecutor(workers) as executor:
+            errors = list(executor.map(_convert_file, pairs, chunksize=chunksize))
+
+    return [(src, error) for (src, _), error in zip(pairs, errors) if error is not None]
 
 def main() -> None:
     """Command line interface entry point."""
     if len(sys.argv) < 2:
         print("Usage: TeleScan2Coe <source.tlscan> [<destination.coe>]")
+        print("       TeleScan2Coe <directory | \"glob\"> [<destination directory>]")
         sys.exit(1)
 
-    src_path = Path(sys.argv[1]).resolve()
+    source = sys.argv[1]
+    # Existing paths win, so names like "scan [2].tlscan" are never treated as patterns
+    if Path(source).is_file():
+        src_paths = None
+    elif Path(source).is_dir():
+        src_paths = sorted(Path(source).resolve().iterdir())
+    elif any(c in source for c in "*?["):
+        src_paths = sorted(Path(p).resolve() for p in glob.glob(source))
+    else:
+        src_paths = None
+
+    if src_paths is not None:
+        src_paths = [p for p in src_paths if p.is_file() and p.suffix.lower() == ".tlscan"]
+
+        if not src_paths:
+            print(f"No .tlscan files found for {source}")
+            sys.exit(1)
+
+        # Parallel workers would overwrite each other's output for inputs sharing a name
+        by_name = {}
+        for src in src_paths:
+            by_name.setdefault(src.stem.lower(), []).append(src)
+        duplicates = [srcs for srcs in by_name.values() if len(srcs) > 1]
+        if duplicates:
+            print("Several inputs would be written to the same .coe file:")
+            for srcs in duplicates:
+                print("  " + ", ".join(str(src) for src in srcs))
+            sys.exit(1)
+
+        dst_dir = Path("~/Desktop").expanduser() if len(sys.argv) < 3 else Path(sys.argv[2]).resolve()
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        failures = convert_many([(src, dst_dir / f"{src.stem}.coe") for src in src_paths])
+        for src, error in failures:
+            print(f"{src}: {error}")
+
+        print(f"Successfully converted {len(src_paths) - len(failures)} of {len(src_paths)} files to {dst_dir}")
+        if failures:
+            sys.exit(1)
+        return
+
+    src_path = Path(source).resolve()
     dst_path = Path("~/Desktop/output.coe").expanduser() if len(sys.argv) < 3 else Path(sys.argv[2]).resolve()
 
-    converter = TeleScanConverter(XMLFileReader(), COEFileWriter())
+    converter = TeleScanConverter(FastXMLFileReader(), COEFileWriter())
     converter.convert(src_path, dst_path)
     print(f"Successfully converted to {dst_path}")
 